@@ -1,16 +1,652 @@
 import os
 import shutil
+import hashlib
+import sqlite3
 import argparse
+import functools
 import json
+import mimetypes
+import re
 import time
+import traceback
+import queue
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Fall back to the standard library json module
+
+try:
+    from requests_toolbelt import MultipartEncoder, MultipartEncoderMonitor
+except ImportError:
+    MultipartEncoder = None  # Fall back to letting requests build the body
+    MultipartEncoderMonitor = None
+
 # print(f"Current working directory: {os.getcwd()}")
 
-def upload_videos_to_facebook(folder_path, access_token, page_id, caption=None, debug=False):
+GRAPH_API_URL = "https://graph.facebook.com/v16.0"
+USER_AGENT = "fb-video-uploader/1.0"
+CAPTION_FILE = "caption.txt"
+HASHTAGS_FILE = "hashtags.txt"
+CONNECT_TIMEOUT = 10  # seconds to establish a connection
+MIN_READ_TIMEOUT = 60  # seconds; grows with the file size for large uploads
+UPLOAD_DEADLINE = 30 * 60  # seconds allowed for one video including retries
+CHUNK_MAX_RETRIES = 5
+READ_BUFFER_SIZE = 4 * 1024 * 1024  # 4 MiB reads instead of the 8 KiB default
+VIDEO_CONTENT_TYPES = {
+    '.mp4': 'video/mp4',
+    '.mov': 'video/quicktime',
+    '.avi': 'video/x-msvideo',
+    '.mkv': 'video/x-matroska',
+    '.wmv': 'video/x-ms-wmv'
+}
+# One compiled, case-insensitive pattern for all supported extensions
+VIDEO_FILE_RE = re.compile(
+    r'\.(?:' + '|'.join(re.escape(ext[1:]) for ext in VIDEO_CONTENT_TYPES) + r')$',
+    re.IGNORECASE
+)
+UPLOAD_LOG_FILE = "fb_upload_log.jsonl"
+UPLOAD_HISTORY_DB = "uploaded.db"
+LOG_BUFFER_SIZE = 1024 * 1024
+UPLOAD_WORKERS = 5  # videos uploaded concurrently
+UPLOAD_BURST = 5  # uploads allowed back to back when pacing with --uploads-per-hour
+RATE_LIMIT_THRESHOLD = 75  # percent of a Graph API usage quota before backing off
+RATE_LIMIT_BACKOFF = 60  # seconds to pause once the threshold is reached
+RATE_LIMIT_ERROR_CODES = {4, 17, 32, 613}  # Graph API "too many calls" errors
+RATE_LIMITED_SLEEP = 3600  # seconds to pause after an actual rate-limit error
+RATE_LIMIT_REQUEUES = 3  # times a rate-limited video is put back on the queue
+
+def _json_loads(data):
+    """Decode JSON from bytes or str, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _json_dumps(obj, indent=False):
+    """Encode an object as a JSON string, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode('utf-8')
+    if indent:
+        return json.dumps(obj, indent=2)
+    return json.dumps(obj, separators=(',', ':'))
+
+def rate_limit_delay(response):
+    """
+    Work out how long to pause the uploads from a Graph API response
+    
+    Uses the X-App-Usage and X-Business-Use-Case-Usage headers Facebook adds
+    to every response, and falls back to a full hour on rate-limit errors.
+    
+    Returns:
+        Seconds to wait, 0 when usage is below the threshold
+    """
+    if response.status_code != 200:
+        try:
+            error = _json_loads(response.content).get('error', {})
+            error_code = error.get('code')
+        except (ValueError, AttributeError):
+            error_code = None  # Not the usual {"error": {...}} body
+        if error_code in RATE_LIMIT_ERROR_CODES:
+            return RATE_LIMITED_SLEEP
+    
+    # This runs as a hook on every response, so any unexpected header shape
+    # is treated as "no usage info" instead of failing the request
+    delay = 0
+    try:
+        app_usage = _json_loads(response.headers.get('X-App-Usage', '{}'))
+        business_usage = _json_loads(response.headers.get('X-Business-Use-Case-Usage', '{}'))
+        
+        usage_entries = [app_usage]
+        for entries in business_usage.values():
+            usage_entries.extend(entries)
+        
+        for usage in usage_entries:
+            percentages = [float(usage.get(key, 0)) for key in ('call_count', 'total_cputime', 'total_time')]
+            if max(percentages) >= RATE_LIMIT_THRESHOLD:
+                delay = max(delay, RATE_LIMIT_BACKOFF)
+            # Reported in minutes
+            delay = max(delay, float(usage.get('estimated_time_to_regain_access', 0)) * 60)
+    except (ValueError, TypeError, AttributeError):
+        return delay
+    
+    return delay
+
+class RateLimitTracker:
+    """Pauses the upload threads for as long as the Graph API usage requires"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resume_at = 0
+    
+    def wait(self):
+        """Block until any pause requested by earlier responses is over"""
+        with self._lock:
+            delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            print(f"Graph API usage is high, waiting {delay:.0f} seconds before the next upload...")
+            time.sleep(delay)
+    
+    def __call__(self, response, *args, **kwargs):
+        # Called as a requests response hook from the upload threads
+        delay = rate_limit_delay(response)
+        if delay:
+            with self._lock:
+                self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+class TokenBucket:
+    """Hands out upload slots at a fixed hourly rate, allowing short bursts"""
+    def __init__(self, capacity, per_hour):
+        if per_hour <= 0:
+            raise ValueError("per_hour must be positive")
+        self._tokens = threading.BoundedSemaphore(capacity)
+        self._interval = 3600 / per_hour
+        threading.Thread(target=self._refill, daemon=True).start()
+    
+    def _refill(self):
+        while True:
+            time.sleep(self._interval)
+            try:
+                self._tokens.release()
+            except ValueError:
+                pass  # Bucket is already full
+    
+    def acquire(self):
+        self._tokens.acquire()
+
+# One session for the whole run, shared by the upload threads, so the TCP/TLS
+# connections to graph.facebook.com are reused instead of set up per request.
+# Connection errors are retried for every method since nothing has been sent
+# yet; 5xx responses are only retried for GET because a streamed upload body
+# cannot be replayed (chunk transfers have their own retry loop).
+http_session = requests.Session()
+http_session.mount('https://', HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=8,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=1,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=['GET']
+    )
+))
+# requests already advertises gzip/deflate (and br when brotli is installed)
+http_session.headers.update({'User-Agent': USER_AGENT})
+rate_limiter = RateLimitTracker()
+http_session.hooks['response'].append(rate_limiter)
+
+@functools.lru_cache(maxsize=None)
+def read_text_file(path):
+    """Read and strip a small text file once, returning None if it does not exist"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return f.read().strip()
+
+class UploadHistory:
+    """Persistent record of already uploaded files, keyed by page and content hash"""
+    def __init__(self, db_path=UPLOAD_HISTORY_DB):
+        # Shared by the upload threads, so access is serialized with a lock
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(db_path, check_same_thread=False)
+        with self._con:
+            # The older page-less "uploaded" table can't tell which page a video went to, so it is not read
+            self._con.execute(
+                "CREATE TABLE IF NOT EXISTS page_uploads "
+                "(page_id TEXT, sha256 TEXT, video_id TEXT, PRIMARY KEY (page_id, sha256))"
+            )
+    
+    def lookup(self, page_id, sha256):
+        """Return the video ID a file with this hash was uploaded to the page as, or None"""
+        with self._lock:
+            row = self._con.execute(
+                "SELECT video_id FROM page_uploads WHERE page_id = ? AND sha256 = ?", (page_id, sha256)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def record(self, page_id, sha256, video_id):
+        with self._lock, self._con:
+            self._con.execute(
+                "INSERT OR REPLACE INTO page_uploads (page_id, sha256, video_id) VALUES (?, ?, ?)",
+                (page_id, sha256, video_id)
+            )
+    
+    def close(self):
+        self._con.close()
+
+def file_sha256(path):
+    """Hash a file with SHA-256, reading it in large blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb', buffering=READ_BUFFER_SIZE) as f:
+        for block in iter(lambda: f.read(READ_BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class FacebookAPIError(Exception):
+    """Raised when the Graph API answers with an error response"""
+    def __init__(self, response, default_message="Unknown error during upload"):
+        try:
+            self.details = _json_loads(response.content)
+        except ValueError:
+            self.details = {}
+        self.status_code = response.status_code
+        error = self.details.get('error') if isinstance(self.details, dict) else None
+        if not isinstance(error, dict):
+            error = {}
+        self.code = error.get('code')
+        message = error.get('message', default_message)
+        super().__init__(message)
+    
+    @property
+    def rate_limited(self):
+        return self.code in RATE_LIMIT_ERROR_CODES
+
+class UploadCancelled(Exception):
+    """Raised inside an upload that was cancelled because another attempt won"""
+
+def video_content_type(file_name):
+    """Get the MIME type to declare for a video file from its extension"""
+    extension = os.path.splitext(file_name)[1].lower()
+    content_type = VIDEO_CONTENT_TYPES.get(extension)
+    if content_type is None:
+        content_type = mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+    return content_type
+
+class _FileSlice:
+    """
+    Read-only view of `length` bytes of an open file, starting at `offset`
+    
+    Lets MultipartEncoder stream an upload chunk straight from the file in
+    small reads instead of holding the whole chunk in memory.
+    """
+    def __init__(self, file_obj, offset, length):
+        file_obj.seek(offset)
+        self._file = file_obj
+        self._remaining = length
+    
+    def __len__(self):
+        return self._remaining
+    
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        # Stop at a premature end of file instead of looping forever
+        self._remaining = self._remaining - len(data) if data else 0
+        return data
+
+def _transfer_chunk(post_url, payload, video_file_obj, offset, length, file_name, timeout, deadline,
+                    progress_callback=None):
+    """
+    Send one chunk of a resumable upload, retrying with exponential backoff
+
+    The chunk is the `length` bytes of the open video file starting at
+    `offset`; it is re-read from the file on every attempt. When streaming
+    with requests-toolbelt, progress_callback is called as bytes are sent.
+    Only network errors and 5xx responses are retried; any other error
+    response is raised immediately as a FacebookAPIError. No retry is started
+    that would run past the upload deadline (a time.monotonic() value).
+
+    Returns:
+        The JSON response with the next start_offset/end_offset
+    """
+    content_type = video_content_type(file_name)
+    for attempt in range(CHUNK_MAX_RETRIES):
+        try:
+            if MultipartEncoder is not None:
+                # Stream the chunk from the file onto the socket instead of
+                # reading it into memory and building the body around it
+                fields = {key: str(value) for key, value in payload.items()}
+                fields['video_file_chunk'] = (file_name, _FileSlice(video_file_obj, offset, length), content_type)
+                encoder = MultipartEncoder(fields=fields)
+                body = encoder
+                if progress_callback is not None:
+                    body = MultipartEncoderMonitor(encoder, lambda monitor: progress_callback())
+                response = http_session.post(
+                    post_url,
+                    data=body,
+                    headers={'Content-Type': encoder.content_type},
+                    timeout=timeout
+                )
+            else:
+                video_file_obj.seek(offset)
+                chunk = video_file_obj.read(length)
+                response = http_session.post(
+                    post_url,
+                    data=payload,
+                    files={'video_file_chunk': (file_name, chunk, content_type)},
+                    timeout=timeout
+                )
+            if response.status_code == 200:
+                return _json_loads(response.content)
+            if response.status_code < 500:
+                raise FacebookAPIError(response)
+            error = FacebookAPIError(response)
+        except requests.exceptions.RequestException as e:
+            error = e
+        
+        if attempt + 1 < CHUNK_MAX_RETRIES:
+            delay = 2 ** attempt
+            if time.monotonic() + delay > deadline:
+                print(f"Chunk upload failed ({error}), upload deadline reached")
+                break
+            print(f"Chunk upload failed ({error}), retrying in {delay}s...")
+            time.sleep(delay)
+    
+    raise error
+
+def upload_video_resumable(post_url, video_path, access_token, description, title,
+                           connect_timeout=CONNECT_TIMEOUT, upload_deadline=UPLOAD_DEADLINE,
+                           progress_callback=None, cancel=None):
+    """
+    Upload a single video using the Graph API resumable upload protocol
+    
+    The file is sent in the chunks requested by Facebook (start/transfer/finish
+    phases), so a network hiccup only costs a retry of the failed chunk instead
+    of restarting the whole upload.
+    
+    Args:
+        post_url: Graph API videos endpoint of the page
+        video_path: Path to the video file
+        access_token: Facebook access token
+        description: Description (caption) for the video
+        title: Title for the video
+        connect_timeout: Seconds to wait for a connection to be established
+        upload_deadline: Seconds the whole upload, retries included, may take
+        progress_callback: Optional function called whenever data was sent
+        cancel: Optional threading.Event; once set, the upload stops before its next chunk
+    
+    Returns:
+        The ID of the uploaded video
+    """
+    deadline = time.monotonic() + upload_deadline
+    file_name = os.path.basename(video_path)
+    file_size = os.path.getsize(video_path)
+    
+    # Allow slow but progressing uploads of large files, fail fast on dead links
+    read_timeout = max(MIN_READ_TIMEOUT, int(file_size / (1024 * 1024) * 2))
+    timeout = (connect_timeout, read_timeout)
+    
+    # Phase 1: open an upload session
+    response = http_session.post(post_url, data={
+        'access_token': access_token,
+        'upload_phase': 'start',
+        'file_size': file_size
+    }, timeout=timeout)
+    if response.status_code != 200:
+        raise FacebookAPIError(response)
+    session_info = _json_loads(response.content)
+    response.close()
+    
+    video_id = session_info.get('video_id')
+    upload_session_id = session_info['upload_session_id']
+    start_offset = int(session_info['start_offset'])
+    end_offset = int(session_info['end_offset'])
+    
+    # Phase 2: send the chunks Facebook asks for until both offsets meet
+    with open(video_path, 'rb', buffering=READ_BUFFER_SIZE) as video_file_obj:
+        while start_offset < end_offset:
+            if time.monotonic() > deadline:
+                raise requests.exceptions.Timeout(f"Upload deadline of {upload_deadline}s exceeded")
+            if cancel is not None and cancel.is_set():
+                raise UploadCancelled(f"Upload of {file_name} cancelled")
+            
+            print(f"Uploading bytes {start_offset}-{end_offset} of {file_size}")
+            
+            chunk_info = _transfer_chunk(post_url, {
+                'access_token': access_token,
+                'upload_phase': 'transfer',
+                'upload_session_id': upload_session_id,
+                'start_offset': start_offset
+            }, video_file_obj, start_offset, end_offset - start_offset, file_name, timeout, deadline,
+               progress_callback)
+            start_offset = int(chunk_info['start_offset'])
+            end_offset = int(chunk_info['end_offset'])
+            if progress_callback is not None:
+                progress_callback()
+    
+    # Phase 3: close the session and publish the video
+    response = http_session.post(post_url, data={
+        'access_token': access_token,
+        'upload_phase': 'finish',
+        'upload_session_id': upload_session_id,
+        'description': description,
+        'title': title
+    }, timeout=timeout)
+    if response.status_code != 200:
+        raise FacebookAPIError(response)
+    # A 200 alone doesn't mean the video was published; the body says so
+    try:
+        published = _json_loads(response.content).get('success') is True
+    except ValueError:
+        published = False
+    if not published:
+        raise FacebookAPIError(response, "Facebook did not confirm that the video was published")
+    response.close()
+    
+    return video_id
+
+def _delete_duplicate_video(future, access_token):
+    """Remove the video of a losing hedged upload if it finished successfully"""
+    if future.cancelled() or future.exception() is not None:
+        return
+    video_id = future.result()
+    try:
+        response = http_session.delete(
+            f"{GRAPH_API_URL}/{video_id}",
+            params={"access_token": access_token},
+            timeout=(CONNECT_TIMEOUT, MIN_READ_TIMEOUT)
+        )
+        if response.status_code != 200:
+            raise FacebookAPIError(response)
+        print(f"Deleted duplicate video from hedged upload: {video_id}")
+    except Exception as e:
+        print(f"Error deleting duplicate video {video_id}: {e}")
+
+def upload_video_hedged(post_url, video_path, access_token, description, title,
+                        connect_timeout, upload_deadline, hedge_delay, outstanding=None):
+    """
+    Upload a video, starting a second (hedged) upload if the first one stalls
+    
+    If the first upload makes no progress for hedge_delay seconds, a second
+    resumable upload of the same file is started and whichever finishes first
+    wins. The losing attempt is told to stop before its next chunk; should it
+    still succeed, the slower copy is deleted from the page.
+    
+    The losing attempt may still be reading the file when this returns, so
+    its future is appended to the outstanding list (if given) and the file
+    must not be deleted before it is done.
+    
+    Returns:
+        The ID of the uploaded video
+    """
+    last_progress = [time.monotonic()]
+    
+    def on_progress():
+        last_progress[0] = time.monotonic()
+    
+    upload_args = (post_url, video_path, access_token, description, title, connect_timeout, upload_deadline)
+    executor = ThreadPoolExecutor(max_workers=2)
+    try:
+        primary_cancel = threading.Event()
+        primary = executor.submit(upload_video_resumable, *upload_args, on_progress, primary_cancel)
+        while True:
+            done, _ = wait([primary], timeout=1)
+            if done:
+                return primary.result()
+            if time.monotonic() - last_progress[0] >= hedge_delay:
+                break
+        
+        print(f"No upload progress for {hedge_delay}s, starting a hedged upload of {video_path}")
+        hedge_cancel = threading.Event()
+        attempts = {
+            primary: primary_cancel,
+            executor.submit(upload_video_resumable, *upload_args, None, hedge_cancel): hedge_cancel
+        }
+        pending = set(attempts)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((future for future in done if future.exception() is None), None)
+            if winner is not None:
+                for future, cancel in attempts.items():
+                    if future is not winner:
+                        cancel.set()
+                        future.add_done_callback(lambda f: _delete_duplicate_video(f, access_token))
+                        if outstanding is not None and not future.done():
+                            outstanding.append(future)
+                return winner.result()
+        
+        # Both attempts failed, report the error of the first one
+        return primary.result()
+    finally:
+        executor.shutdown(wait=False)
+
+def _upload_one(folder_path, video_file, access_token, page_id, post_url, base_caption, debug=False,
+                connect_timeout=CONNECT_TIMEOUT, upload_deadline=UPLOAD_DEADLINE, history=None,
+                hedge_delay=0):
+    """
+    Upload one video file and report the outcome
+    
+    Runs in a worker thread, so apart from the (locked) upload history it only
+    touches its own locals and returns the result instead of updating shared
+    state. Files whose content is already in the history are not uploaded again.
+    With a hedge_delay, a stalled upload is hedged by a second one.
+    
+    Returns:
+        Result dict with the file name, status and either video_id/url or error
+    """
+    video_path = os.path.join(folder_path, video_file)
+    print(f"\n[{video_file}] Processing")
+    
+    file_name = os.path.basename(video_path)
+    description = file_name + base_caption
+    try:
+        # Check if file exists and get size
+        if not os.path.exists(video_path):
+            print(f"[{video_file}] Error: File not found - {video_path}")
+            return {"file": video_file, "status": "failed", "error": "File not found"}
+        
+        file_size = os.path.getsize(video_path) / (1024 * 1024)  # Size in MB
+        print(f"[{video_file}] File size: {file_size:.2f} MB")
+        
+        # Skip files that were already uploaded by an earlier run
+        sha256 = None
+        if history is not None:
+            sha256 = file_sha256(video_path)
+            video_id = history.lookup(page_id, sha256)
+            if video_id:
+                video_url = f"https://www.facebook.com/{page_id}/videos/{video_id}"
+                print(f"[{video_file}] Already uploaded as video {video_id}, skipping")
+                return {
+                    "file": video_file,
+                    "status": "success",
+                    "video_id": video_id,
+                    "url": video_url,
+                    "duplicate": True
+                }
+        
+        # Chunked resumable upload
+        print(f"[{video_file}] Uploading to Facebook... (this may take several minutes)")
+        
+        outstanding = []
+        if hedge_delay:
+            video_id = upload_video_hedged(
+                post_url,
+                video_path,
+                access_token,
+                description,
+                os.path.splitext(video_file)[0],
+                connect_timeout,
+                upload_deadline,
+                hedge_delay,
+                outstanding
+            )
+        else:
+            video_id = upload_video_resumable(
+                post_url,
+                video_path,
+                access_token,
+                description,
+                os.path.splitext(video_file)[0],
+                connect_timeout,
+                upload_deadline
+            )
+        video_url = f"https://www.facebook.com/{page_id}/videos/{video_id}"
+        if history is not None:
+            history.record(page_id, sha256, video_id)
+        
+        print(f"[{video_file}] Upload successful! Video ID: {video_id}")
+        print(f"[{video_file}] Video URL: {video_url}")
+        result = {
+            "file": video_file,
+            "status": "success",
+            "video_id": video_id,
+            "url": video_url
+        }
+        if outstanding:
+            # Not logged; tells the caller to wait for these before deleting the file
+            result["outstanding"] = outstanding
+        return result
+    
+    except FacebookAPIError as e:
+        print(f"[{video_file}] Error: {e}")
+        if debug:
+            print(f"Full error response: {e.details}")
+        result = {"file": video_file, "status": "failed", "error": str(e)}
+        if e.rate_limited:
+            result["rate_limited"] = True
+        return result
+    except requests.exceptions.RequestException as e:
+        print(f"[{video_file}] Network error during upload: {e}")
+        return {"file": video_file, "status": "failed", "error": str(e)}
+    except Exception as e:
+        print(f"[{video_file}] Error during upload: {e}")
+        if debug:
+            traceback.print_exc()
+        return {"file": video_file, "status": "failed", "error": str(e)}
+
+def _remove_when_done(path, attempts):
+    """Delete a file once the upload attempts still reading it have finished"""
+    wait(attempts)
+    os.remove(path)
+
+def _upload_worker(jobs, results, token_bucket, upload_kwargs):
+    """
+    Upload videos taken from the jobs queue until it is empty
+    
+    Jobs are (video_file, requeues) tuples. A video that fails with a rate-limit
+    error is put back on the queue, to be retried once the pause is over,
+    instead of being reported as failed.
+    """
+    while True:
+        try:
+            video_file, requeues = jobs.get_nowait()
+        except queue.Empty:
+            return
+        
+        rate_limiter.wait()
+        if token_bucket is not None:
+            token_bucket.acquire()
+        result = _upload_one(video_file=video_file, **upload_kwargs)
+        if result.get("rate_limited") and requeues < RATE_LIMIT_REQUEUES:
+            print(f"[{video_file}] Rate limited, will retry after the pause")
+            jobs.put((video_file, requeues + 1))
+            continue
+        results.put(result)
+
+def upload_videos_to_facebook(folder_path, access_token, page_id, caption=None, debug=False,
+                              connect_timeout=CONNECT_TIMEOUT, upload_deadline=UPLOAD_DEADLINE,
+                              uploads_per_hour=0, hedge_delay=0):
     """
-    Upload videos from a folder to a Facebook page in batches of 5, delete after successful upload
+    Upload videos from a folder to a Facebook page, delete after successful upload
+    
+    Videos are uploaded by a fixed pool of threads fed from a queue. They pause
+    whenever the Graph API usage headers ask for it and, if uploads_per_hour is
+    set, are additionally paced by a token bucket.
     
     Args:
         folder_path: Path to folder containing videos
@@ -18,6 +654,10 @@ def upload_videos_to_facebook(folder_path, access_token, page_id, caption=None,
         page_id: Facebook page ID
         caption: Optional caption to use for all videos
         debug: Whether to show detailed error information
+        connect_timeout: Seconds to wait for a connection to Facebook
+        upload_deadline: Seconds one video upload, retries included, may take
+        uploads_per_hour: Maximum sustained upload rate, 0 for no fixed limit
+        hedge_delay: Seconds without progress before a hedged upload is started, 0 to disable
     """
     # Check if folder exists
     if not os.path.isdir(folder_path):
@@ -26,178 +666,133 @@ def upload_videos_to_facebook(folder_path, access_token, page_id, caption=None,
     
     # Verify token and page access
     try:
-        response = requests.get(
-            f"https://graph.facebook.com/v16.0/{page_id}",
-            params={"access_token": access_token}
+        response = http_session.get(
+            f"{GRAPH_API_URL}/{page_id}",
+            params={"access_token": access_token},
+            timeout=(connect_timeout, MIN_READ_TIMEOUT)
         )
+        page_info = _json_loads(response.content)
         if response.status_code != 200:
-            print(f"Error connecting to Facebook page: {response.json().get('error', {}).get('message', 'Unknown error')}")
+            print(f"Error connecting to Facebook page: {page_info.get('error', {}).get('message', 'Unknown error')}")
             if debug:
-                print(f"Full error response: {response.json()}")
+                print(f"Full error response: {page_info}")
             return False
-        page_info = response.json()
         print(f"Connected to Facebook Page: {page_info.get('name', 'Unknown')}")
         response.close()
     
     except Exception as e:
         print(f"Error verifying access: {e}")
         if debug:
-            import traceback
             traceback.print_exc()
         return False
     
-    # Get all video files in the folder
-    video_extensions = ['.mp4', '.mov', '.avi', '.mkv', '.wmv']
-    video_files = [f for f in os.listdir(folder_path) 
-                   if any(f.lower().endswith(ext) for ext in video_extensions)]
+    # Get all video files in the folder, sorted by name
+    with os.scandir(folder_path) as entries:
+        video_files = sorted(
+            entry.name for entry in entries
+            if VIDEO_FILE_RE.search(entry.name) and entry.is_file()
+        )
     
     if not video_files:
         print(f"No video files found in {folder_path}")
         return False
     
-    # Sort files by name
-    video_files.sort()
     print(f"Found {len(video_files)} video file(s) to upload")
     
     # Read caption from file if it exists
-    caption_file = "caption.txt"
-    if os.path.exists(caption_file):
-        with open(caption_file, 'r') as f:
-            caption = f.read().strip()
-        print(f"Using caption from {caption_file}")
+    file_caption = read_text_file(CAPTION_FILE)
+    if file_caption is not None:
+        caption = file_caption
+        print(f"Using caption from {CAPTION_FILE}")
     
     # Set default caption if none provided and no caption file
     if not caption:
         caption = "Check out this video!"
     
     # Read hashtags from file if it exists
-    hashtags = ""
-    hashtags_file = "hashtags.txt"
-    if os.path.exists(hashtags_file):
-        with open(hashtags_file, 'r') as f:
-            hashtags = f.read().strip()
-        print(f"Using hashtags from {hashtags_file}")
+    hashtags = read_text_file(HASHTAGS_FILE) or ""
+    if hashtags:
+        print(f"Using hashtags from {HASHTAGS_FILE}")
     
     # Combine caption and hashtags
     if hashtags:
-        full_caption = f"{caption}\n\n{hashtags}"
+        base_caption = f"{caption}\n\n{hashtags}"
     else:
-        full_caption = caption
+        base_caption = caption
+    
+    post_url = f"{GRAPH_API_URL}/{page_id}/videos"
     
     # Track results and file paths
     upload_status = {}
-    batch_size = 5
+    pending_deletes = {}
     
-    # Process videos in batches
-    for batch_start in range(0, len(video_files), batch_size):
-        batch_files = video_files[batch_start:batch_start + batch_size]
-        batch_results = []
-        files_to_delete = []
-        
-        print(f"\nProcessing batch {batch_start // batch_size + 1} ({len(batch_files)} videos)")
-        
-        # Process each video in the batch
-        for i, video_file in enumerate(batch_files):
-            video_path = os.path.join(folder_path, video_file)
-            print(f"\n[{i+1}/{len(batch_files)} in batch] Processing {video_file}")
-            
-            file_name = os.path.basename(video_path) 
-            full_caption = file_name + full_caption
-            try:
-                # Check if file exists and get size
-                if not os.path.exists(video_path):
-                    print(f"Error: File not found - {video_path}")
-                    upload_status[video_path] = {"status": "failed", "error": "File not found"}
-                    batch_results.append({"file": video_file, "status": "failed", "error": "File not found"})
-                    continue
-                
-                file_size = os.path.getsize(video_path) / (1024 * 1024)  # Size in MB
-                print(f"File size: {file_size:.2f} MB")
-                
-                # Direct single-request upload
-                print("Uploading to Facebook... (this may take several minutes)")
-                
-                with open(video_path, 'rb') as video_file_obj:
-                    post_url = f"https://graph.facebook.com/v16.0/{page_id}/videos"
-                    
-                    payload = {
-                        'access_token': access_token,
-                        'description': full_caption,
-                        'title': os.path.splitext(video_file)[0]
-                    }
-                    
-                    files = {
-                        'source': (video_file, video_file_obj, 'video/mp4')
-                    }
-                    
-                    response = requests.post(post_url, data=payload, files=files, timeout=300)
-                    
-                    if response.status_code != 200:
-                        error_msg = response.json().get('error', {}).get('message', 'Unknown error during upload')
-                        print(f"Error: {error_msg}")
-                        if debug:
-                            print(f"Full error response: {response.json()}")
-                        upload_status[video_path] = {"status": "failed", "error": error_msg}
-                        batch_results.append({"file": video_file, "status": "failed", "error": error_msg})
-                        response.close()
-                        continue
-                    
-                    video_info = response.json()
-                    video_id = video_info.get('id')
-                    video_url = f"https://www.facebook.com/{page_id}/videos/{video_id}"
-                    
-                    print(f"Upload successful! Video ID: {video_id}")
-                    print(f"Video URL: {video_url}")
-                    upload_status[video_path] = {
-                        "status": "success",
-                        "video_id": video_id,
-                        "url": video_url
-                    }
-                    batch_results.append({
-                        "file": video_file,
-                        "status": "success",
-                        "video_id": video_id,
-                        "url": video_url
-                    })
-                    files_to_delete.append(video_path)
-                    response.close()
-            
-            except requests.exceptions.RequestException as e:
-                print(f"Network error during upload: {e}")
-                upload_status[video_path] = {"status": "failed", "error": str(e)}
-                batch_results.append({"file": video_file, "status": "failed", "error": str(e)})
-            except Exception as e:
-                print(f"Error during upload: {e}")
-                if debug:
-                    import traceback
-                    traceback.print_exc()
-                upload_status[video_path] = {"status": "failed", "error": str(e)}
-                batch_results.append({"file": video_file, "status": "failed", "error": str(e)})
-        
-        # Delete files that were successfully uploaded
-        for file_path in files_to_delete:
-            try:
-                os.remove(file_path)
-                print(f"Deleted file: {file_path}")
-            except Exception as e:
-                print(f"Error deleting file {file_path}: {e}")
-                upload_status[file_path]["error"] = f"Failed to delete: {str(e)}"
-        
-        # Save batch results to log
-        log_file = f"fb_upload_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(log_file, 'w') as f:
-            json.dump(batch_results, f, indent=2)
-        print(f"Batch log saved to {log_file}")
-        
-        # Wait before next batch
-        if batch_start + batch_size < len(video_files):
-            print("Waiting 1 hour before next batch...")
-            time.sleep(3600)
+    # Uploaded files are deleted in the background so slow deletes (e.g. on
+    # network storage) overlap with the uploads still running
+    deleter = ThreadPoolExecutor(max_workers=4)
+    
+    # Content hashes of uploaded files, so reruns skip what already succeeded
+    history = UploadHistory()
+    
+    # Append one JSON line per upload result to a single log file
+    upload_log = open(UPLOAD_LOG_FILE, 'a', encoding='utf-8', buffering=LOG_BUFFER_SIZE)
+    
+    # Feed the videos to a fixed pool of upload threads; the work is
+    # network-bound so they spend their time waiting on sockets, not the GIL
+    jobs = queue.Queue()
+    for video_file in video_files:
+        jobs.put((video_file, 0))
+    results = queue.Queue()
+    token_bucket = TokenBucket(UPLOAD_BURST, uploads_per_hour) if uploads_per_hour else None
+    upload_kwargs = {
+        "folder_path": folder_path,
+        "access_token": access_token,
+        "page_id": page_id,
+        "post_url": post_url,
+        "base_caption": base_caption,
+        "debug": debug,
+        "connect_timeout": connect_timeout,
+        "upload_deadline": upload_deadline,
+        "history": history,
+        "hedge_delay": hedge_delay
+    }
+    workers = [
+        threading.Thread(target=_upload_worker, args=(jobs, results, token_bucket, upload_kwargs), daemon=True)
+        for _ in range(min(UPLOAD_WORKERS, len(video_files)))
+    ]
+    for worker in workers:
+        worker.start()
+    
+    # Collect the results as they come in
+    for _ in range(len(video_files)):
+        result = results.get()
+        outstanding = result.pop("outstanding", [])
+        video_path = os.path.join(folder_path, result["file"])
+        upload_status[video_path] = {k: v for k, v in result.items() if k != "file"}
+        log_entry = {"time": datetime.now().isoformat(timespec='seconds'), **result}
+        upload_log.write(_json_dumps(log_entry) + '\n')
+        upload_log.flush()
+        if result["status"] == "success":
+            pending_deletes[video_path] = deleter.submit(_remove_when_done, video_path, outstanding)
+    
+    upload_log.close()
+    history.close()
+    print(f"\nUpload results appended to {UPLOAD_LOG_FILE}")
+    
+    # Wait for every deletion (some wait on a losing hedged upload) so that
+    # each outcome makes it into the status file
+    deleter.shutdown(wait=True)
+    for file_path, delete_future in pending_deletes.items():
+        error = delete_future.exception()
+        if error is None:
+            print(f"Deleted file: {file_path}")
+        else:
+            print(f"Error deleting file {file_path}: {error}")
+            upload_status[file_path]["error"] = f"Failed to delete: {str(error)}"
     
     # Save overall upload status
     status_log = f"fb_upload_status_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    with open(status_log, 'w') as f:
-        json.dump(upload_status, f, indent=2)
+    with open(status_log, 'w', encoding='utf-8') as f:
+        f.write(_json_dumps(upload_status, indent=True))
     print(f"\nOverall upload status saved to {status_log}")
     
     # Print summary
@@ -206,6 +801,13 @@ def upload_videos_to_facebook(folder_path, access_token, page_id, caption=None,
     
     return True
 
+def positive_float(value):
+    """argparse type for options that only make sense above zero"""
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
 def main():
     parser = argparse.ArgumentParser(description="Upload videos to Facebook page")
     parser.add_argument("folder", help="Path to the folder containing videos")
@@ -213,6 +815,14 @@ def main():
     parser.add_argument("--page", help="Facebook page ID (or will look for page_id.txt file)")
     parser.add_argument("--caption", help="Caption to use for all videos (overrides caption.txt)")
     parser.add_argument("--debug", action="store_true", help="Enable debug mode for detailed error information")
+    parser.add_argument("--connect-timeout", type=positive_float, default=CONNECT_TIMEOUT,
+                        help=f"Seconds to wait for a connection to Facebook (default: {CONNECT_TIMEOUT})")
+    parser.add_argument("--upload-deadline", type=positive_float, default=UPLOAD_DEADLINE,
+                        help=f"Seconds allowed per video upload including retries (default: {UPLOAD_DEADLINE})")
+    parser.add_argument("--uploads-per-hour", type=positive_float, default=0,
+                        help="Pace uploads to at most this many per hour (default: no fixed limit)")
+    parser.add_argument("--hedge-delay", type=positive_float, default=0,
+                        help="Start a second upload of a video that made no progress for this many seconds (default: off)")
     args = parser.parse_args()
     
     # Get access token
@@ -244,7 +854,9 @@ def main():
                     f.write(page_id)
     
     # Upload videos
-    upload_videos_to_facebook(args.folder, access_token, page_id, args.caption, args.debug)
+    upload_videos_to_facebook(args.folder, access_token, page_id, args.caption, args.debug,
+                              args.connect_timeout, args.upload_deadline, args.uploads_per_hour,
+                              args.hedge_delay)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
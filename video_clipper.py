@@ -1,18 +1,19 @@
 import os
+import importlib.util
 import tempfile
 import subprocess
 import json
-import whisper
-import torch
 import random
+import numpy as np
 from dataclasses import dataclass
-import shlex
-import glob
 import re
-import math
 import logging
 import sys
+import argparse
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import contextmanager
+from functools import lru_cache
 
 # Set up logging
 logging.basicConfig(
@@ -26,18 +27,45 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-pattern = r'^.*?(?=\.mp4$|\.mkv$)'
 # Configuration
 INPUT_VIDEO = "Change Your Brain Neuroscientist Dr. Andrew Huberman  Rich Roll Podcast.mp4"
-file_name = re.search(pattern, INPUT_VIDEO).group()
+file_name = os.path.splitext(os.path.basename(INPUT_VIDEO))[0]
 OUTPUT_FOLDER = f"output/{file_name}"
 CLIP_DURATION = 60 * 10  # in seconds
 WHISPER_MODEL = "base"  # Options: "tiny", "base", "small", "medium", "large"
 OUTPUT_WIDTH = 1080    # Width for vertical video (9:16 aspect ratio)
 OUTPUT_HEIGHT = 1920   # Height for vertical video
 MUSIC_FOLDER = "music"  # Folder containing background music tracks
+MUSIC_EXTENSIONS = (".mp3", ".wav", ".m4a", ".flac", ".ogg")  # Music track formats to pick from
 MUSIC_VOLUME = 0.2     # Background music volume (0.0 to 1.0)
 DUCK_FACTOR = 0.3      # How much to reduce music during speech (0.0 to 1.0)
+FFMPEG_THREADS = 4     # Threads per ffmpeg process
+FILE_UMASK = os.umask(0)  # Read the process umask (it can only be read by setting it)...
+os.umask(FILE_UMASK)      # ...and put it back
+DEFAULT_JOBS = max(1, (os.cpu_count() or 1) // FFMPEG_THREADS)  # Clips processed in parallel
+WHISPER_SAMPLE_RATE = 16000  # Whisper's native input: 16 kHz mono
+
+# Hardware H.264 encoders to try, in order of preference, with their quality settings
+HW_ENCODERS = {
+    "h264_nvenc": ["-preset", "p4", "-tune", "hq", "-rc", "vbr", "-cq", "23"],
+    "h264_qsv": ["-preset", "fast", "-global_quality", "23"],
+    "h264_videotoolbox": ["-b:v", "8M"],
+}
+SOFTWARE_ENCODER = ("libx264", ["-preset", "fast"])
+
+# Keywords used to guess the transcript's mood for music selection
+MOOD_KEYWORDS = {
+    "happy": ["happy", "joy", "laugh", "fun", "exciting", "amazing", "great", "love", "smile"],
+    "sad": ["sad", "cry", "tragic", "depressing", "sorry", "apology", "unfortunate", "regret"],
+    "energetic": ["energy", "fast", "quick", "rush", "exciting", "action", "dynamic", "power"],
+    "calm": ["calm", "peaceful", "quiet", "relax", "gentle", "soothing", "slow"],
+    "dramatic": ["dramatic", "intense", "serious", "important", "significant", "critical"],
+}
+KEYWORD_MOODS = {
+    word: [mood for mood, words in MOOD_KEYWORDS.items() if word in words]
+    for words in MOOD_KEYWORDS.values() for word in words
+}
+MOOD_KEYWORD_RE = re.compile(r'\b(' + '|'.join(map(re.escape, KEYWORD_MOODS)) + r')\b', re.IGNORECASE)
 
 # Ensure output directory exists
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
@@ -56,42 +84,46 @@ class AudioFeatures:
     genre: str  # pop, rock, electronic, ambient, classical
 
 @contextmanager
-def temp_file(suffix=None):
+def temp_file(suffix=None, dir=None):
     """Context manager for temporary files that ensures cleanup"""
-    fd, path = tempfile.mkstemp(suffix=suffix)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=dir)
     try:
         os.close(fd)
         yield path
     finally:
         try:
-            if os.path.exists(path):
-                os.unlink(path)
-        except Exception as e:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
             logger.warning(f"Failed to delete temporary file {path}: {e}")
 
 def safe_remove(filepath):
     """Safely remove a file if it exists"""
     try:
-        if os.path.exists(filepath):
-            os.unlink(filepath)
-            logger.debug(f"Removed temporary file: {filepath}")
-    except Exception as e:
+        os.unlink(filepath)
+        logger.debug(f"Removed temporary file: {filepath}")
+    except FileNotFoundError:
+        pass
+    except OSError as e:
         logger.warning(f"Failed to remove file {filepath}: {e}")
 
 def safe_rename(src, dst):
-    """Safely rename a file, removing destination first if it exists"""
+    """Safely rename a file, atomically replacing the destination if it exists"""
     try:
-        if os.path.exists(dst):
-            os.unlink(dst)
-        os.replace(src, dst)  # os.replace is more robust than os.rename
+        os.replace(src, dst)  # Overwrites dst on both POSIX and Windows
         logger.debug(f"Renamed {src} to {dst}")
         return True
-    except Exception as e:
+    except OSError as e:
         logger.error(f"Failed to rename {src} to {dst}: {e}")
         return False
 
-def run_command(cmd, shell=False, check=True):
-    """Run a subprocess command with proper error handling and increased buffer size"""
+def run_command(cmd, shell=False, check=True, capture=False):
+    """
+    Run a subprocess command with proper error handling
+    
+    stdout is discarded unless capture is True; stderr is always kept for error messages.
+    """
     try:
         logger.debug(f"Running command: {cmd if isinstance(cmd, str) else ' '.join(cmd)}")
         
@@ -102,7 +134,9 @@ def run_command(cmd, shell=False, check=True):
         
         result = subprocess.run(
             cmd, 
-            capture_output=True, 
+            stdin=subprocess.DEVNULL,  # Keep ffmpeg off the terminal; parallel runs would fight over it
+            stdout=subprocess.PIPE if capture else subprocess.DEVNULL, 
+            stderr=subprocess.PIPE, 
             text=True, 
             shell=shell, 
             check=check
@@ -115,20 +149,98 @@ def run_command(cmd, shell=False, check=True):
         logger.error(f"Failed to run command: {e}")
         raise
 
-def transcribe_audio(audio_file_path):
-    """Transcribe audio using local Whisper model"""
+def _compile_whisper_encoder(model):
+    """Compile the Whisper encoder with torch.compile, keeping the eager encoder if that fails"""
+    import torch
+    import whisper
+    
+    if not hasattr(torch, "compile"):
+        return model
+    
+    eager_encoder = model.encoder
+    try:
+        model.encoder = torch.compile(eager_encoder, mode="reduce-overhead")
+        # Compilation is lazy, so run one fixed-size 30 s window now to surface any failure here
+        with torch.no_grad():
+            model.encoder(torch.zeros(
+                1, model.dims.n_mels, whisper.audio.N_FRAMES,
+                device=model.device, dtype=torch.float16
+            ))
+        logger.info("Compiled Whisper encoder with torch.compile")
+    except Exception as e:
+        logger.warning(f"torch.compile failed, using the eager Whisper encoder: {e}")
+        model.encoder = eager_encoder
+    return model
+
+@lru_cache(maxsize=None)
+def get_whisper_model():
+    """
+    Load the Whisper model once and reuse it for every transcription
+    
+    faster-whisper is preferred; OpenAI's whisper is used when it isn't
+    installed. The libraries are imported here rather than at module level so
+    that clip worker processes, which re-import this module when started with
+    spawn, don't load them.
+    
+    Returns:
+        Tuple of (model, True if it is a faster-whisper model)
+    """
     try:
-        # Load Whisper model
-        logger.info(f"Loading Whisper model: {WHISPER_MODEL}")
-        model = whisper.load_model(WHISPER_MODEL)
+        import ctranslate2
+        from faster_whisper import WhisperModel
+    except ImportError:
+        WhisperModel = None
+    
+    if WhisperModel is not None:
+        # int8 on CPU, int8 weights with float16 compute on GPU
+        use_gpu = ctranslate2.get_cuda_device_count() > 0
+        logger.info(f"Loading faster-whisper model: {WHISPER_MODEL}")
+        return WhisperModel(
+            WHISPER_MODEL,
+            device="cuda" if use_gpu else "cpu",
+            compute_type="int8_float16" if use_gpu else "int8",
+            cpu_threads=os.cpu_count() or 0
+        ), True
+    
+    import torch
+    import whisper
+    
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    logger.info(f"Loading Whisper model: {WHISPER_MODEL} ({device})")
+    model = whisper.load_model(WHISPER_MODEL, device=device)
+    
+    if device == "cuda":
+        torch.backends.cudnn.benchmark = True
+        torch.set_float32_matmul_precision("high")
+        model = _compile_whisper_encoder(model)
+    return model, False
+
+def transcribe_audio(audio):
+    """Transcribe 16 kHz mono float32 samples using a local Whisper model (faster-whisper when installed)"""
+    try:
+        model, uses_faster_whisper = get_whisper_model()
         
-        # Transcribe audio
-        logger.info("Running transcription with Whisper...")
-        result = model.transcribe(audio_file_path, word_timestamps=True)
+        if uses_faster_whisper:
+            # Transcribe audio, skipping silence with the Silero VAD
+            logger.info("Running transcription with faster-whisper...")
+            result_segments, _ = model.transcribe(
+                audio, word_timestamps=True, vad_filter=True, beam_size=1
+            )
+            result_segments = [
+                {"start": segment.start, "end": segment.end, "text": segment.text}
+                for segment in result_segments
+            ]
+            full_text = "".join(segment["text"] for segment in result_segments)
+        else:
+            # Transcribe audio
+            logger.info("Running transcription with Whisper...")
+            result = model.transcribe(audio, word_timestamps=True, fp16=model.device.type == "cuda")
+            result_segments = result["segments"]
+            full_text = result["text"]
         
         # Process into segments
         segments = []
-        for segment in result["segments"]:
+        for segment in result_segments:
             segments.append(Segment(
                 start=segment["start"],
                 end=segment["end"],
@@ -136,38 +248,18 @@ def transcribe_audio(audio_file_path):
             ))
         
         logger.info(f"Transcription complete: {len(segments)} segments")
-        return segments, result["text"]
+        return segments, full_text
     except Exception as e:
         logger.error(f"Error during transcription: {e}")
         return [], ""
 
 def analyze_transcript_mood(transcript):
     """Simple analysis of transcript to determine mood for music selection"""
-    # Very basic mood analysis based on keywords
-    happy_words = ["happy", "joy", "laugh", "fun", "exciting", "amazing", "great", "love", "smile"]
-    sad_words = ["sad", "cry", "tragic", "depressing", "sorry", "apology", "unfortunate", "regret"]
-    energetic_words = ["energy", "fast", "quick", "rush", "exciting", "action", "dynamic", "power"]
-    calm_words = ["calm", "peaceful", "quiet", "relax", "gentle", "soothing", "slow"]
-    dramatic_words = ["dramatic", "intense", "serious", "important", "significant", "critical"]
-    
-    # Convert transcript to lowercase for matching
-    transcript_lower = transcript.lower()
-    
-    # Count occurrences of mood-related words
-    happy_count = sum(1 for word in happy_words if word in transcript_lower)
-    sad_count = sum(1 for word in sad_words if word in transcript_lower)
-    energetic_count = sum(1 for word in energetic_words if word in transcript_lower)
-    calm_count = sum(1 for word in calm_words if word in transcript_lower)
-    dramatic_count = sum(1 for word in dramatic_words if word in transcript_lower)
-    
-    # Determine dominant mood
-    mood_counts = {
-        "happy": happy_count,
-        "sad": sad_count,
-        "energetic": energetic_count,
-        "calm": calm_count,
-        "dramatic": dramatic_count
-    }
+    # Very basic mood analysis: count whole-word keyword matches in one pass
+    mood_counts = dict.fromkeys(MOOD_KEYWORDS, 0)
+    for match in MOOD_KEYWORD_RE.finditer(transcript):
+        for mood in KEYWORD_MOODS[match.group(1).lower()]:
+            mood_counts[mood] += 1
     
     # Default to calm if no clear mood is detected
     if all(count == 0 for count in mood_counts.values()):
@@ -185,7 +277,7 @@ def analyze_speech_pattern(segments):
     
     # Calculate average words per minute
     total_duration = segments[-1].end - segments[0].start
-    total_words = sum(len(segment.text.split()) for segment in segments)
+    total_words = len(" ".join(segment.text for segment in segments).split())
     
     if total_duration <= 0:
         return "medium"
@@ -211,11 +303,15 @@ def select_appropriate_music(features):
         os.makedirs(MUSIC_FOLDER)
         return None
     
-    music_files = glob.glob(os.path.join(MUSIC_FOLDER, "*.mp3"))
-    music_files.extend(glob.glob(os.path.join(MUSIC_FOLDER, "*.wav")))
+    # One directory pass; DirEntry answers is_file() without an extra stat on most platforms
+    with os.scandir(MUSIC_FOLDER) as entries:
+        music_files = sorted(
+            entry.path for entry in entries
+            if entry.is_file() and entry.name.lower().endswith(MUSIC_EXTENSIONS)
+        )
     
     if not music_files:
-        logger.warning(f"No music files found in '{MUSIC_FOLDER}'. Please add some .mp3 or .wav files.")
+        logger.warning(f"No music files found in '{MUSIC_FOLDER}'. Please add some {', '.join(MUSIC_EXTENSIONS)} files.")
         return None
     
     # For now, just pick a random track - in a real system you would match by metadata
@@ -225,8 +321,14 @@ def select_appropriate_music(features):
     
     return selected_track
 
-def generate_volume_automation(segments, clip_duration, max_points=5):
-    """Generate volume automation with reduced complexity"""
+def generate_volume_automation(segments, max_points=5):
+    """
+    Generate volume automation with reduced complexity
+    
+    Returns volume filters that duck the music by DUCK_FACTOR during each
+    group of speech. They are relative, so they chain after the constant
+    MUSIC_VOLUME filter.
+    """
     if not segments:
         return None
     
@@ -256,44 +358,26 @@ def generate_volume_automation(segments, clip_duration, max_points=5):
             merged_segments.append({"start": start, "end": end})
         grouped_segments = merged_segments
     
-    # Create volume points for each group
+    # Create a duck point for each group; outside them the music stays at MUSIC_VOLUME
     volume_points = []
-    
-    # Start with full volume
-    if grouped_segments[0]["start"] > 0:
-        volume_points.append(f"volume={MUSIC_VOLUME}")
-    
-    for i, group in enumerate(grouped_segments):
-        # Add duck point for speech
-        volume_points.append(f"volume=enable='between(t,{group['start']},{group['end']})':volume={MUSIC_VOLUME * DUCK_FACTOR}")
-        
-        # Add normal volume point between speech segments
-        if i < len(grouped_segments) - 1 and grouped_segments[i+1]["start"] - group["end"] > 0.5:
-            volume_points.append(f"volume=enable='between(t,{group['end']},{grouped_segments[i+1]['start']})':volume={MUSIC_VOLUME}")
-    
-    # Add final full volume segment if needed
-    if grouped_segments[-1]["end"] < clip_duration:
-        volume_points.append(f"volume=enable='between(t,{grouped_segments[-1]['end']},{clip_duration})':volume={MUSIC_VOLUME}")
+    for group in grouped_segments:
+        volume_points.append(f"volume=enable='between(t,{group['start']:.3f},{group['end']:.3f})':volume={DUCK_FACTOR}")
     
     return volume_points
 
 def generate_srt_file(segments, output_srt_path, time_offset=0):
     """Generate SRT subtitle file from segments"""
     try:
-        with open(output_srt_path, 'w', encoding='utf-8') as srt_file:
-            for i, segment in enumerate(segments, 1):
-                # Adjust times based on offset
-                start_time = max(0, segment.start - time_offset)
-                end_time = max(0, segment.end - time_offset)
-                
-                # Convert to SRT format (HH:MM:SS,mmm)
-                start_formatted = format_time_srt(start_time)
-                end_formatted = format_time_srt(end_time)
-                
-                # Write SRT entry
-                srt_file.write(f"{i}\n")
-                srt_file.write(f"{start_formatted} --> {end_formatted}\n")
-                srt_file.write(f"{segment.text}\n\n")
+        # Build the whole file in memory and write it in one go
+        entries = []
+        for i, segment in enumerate(segments, 1):
+            # Adjust times based on offset and convert to SRT format (HH:MM:SS,mmm)
+            start_formatted = format_time_srt(max(0, segment.start - time_offset))
+            end_formatted = format_time_srt(max(0, segment.end - time_offset))
+            entries.append(f"{i}\n{start_formatted} --> {end_formatted}\n{segment.text}\n\n")
+        
+        with open(output_srt_path, 'w', encoding='utf-8', buffering=1 << 16, newline='\n') as srt_file:
+            srt_file.write("".join(entries))
         
         logger.debug(f"Generated SRT file: {output_srt_path}")
         return output_srt_path
@@ -303,209 +387,272 @@ def generate_srt_file(segments, output_srt_path, time_offset=0):
 
 def format_time_srt(seconds):
     """Format time in seconds to SRT format (HH:MM:SS,mmm)"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    seconds_part = seconds % 60
-    milliseconds = int((seconds_part - int(seconds_part)) * 1000)
-    return f"{hours:02}:{minutes:02}:{int(seconds_part):02},{milliseconds:03}"
+    milliseconds = round(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02}:{minutes:02}:{secs:02},{milliseconds:03}"
+
+@lru_cache(maxsize=None)
+def probe_duration(media_path):
+    """Get the duration of a media file using ffprobe (cached per path)"""
+    cmd = [
+        "ffprobe", 
+        "-v", "error", 
+        "-show_entries", "format=duration", 
+        "-of", "json", 
+        media_path
+    ]
+    
+    result = run_command(cmd, capture=True)
+    data = json.loads(result.stdout)
+    return float(data["format"]["duration"])
 
 def get_video_duration(video_path):
     """Get the duration of a video file using ffprobe"""
     try:
-        cmd = [
-            "ffprobe", 
-            "-v", "error", 
-            "-show_entries", "format=duration", 
-            "-of", "json", 
-            video_path
-        ]
-        
-        result = run_command(cmd)
-        data = json.loads(result.stdout)
-        duration = float(data["format"]["duration"])
+        duration = probe_duration(video_path)
         logger.info(f"Video duration: {duration:.2f} seconds")
         return duration
     except Exception as e:
         logger.error(f"Failed to get video duration: {e}")
         return 0
 
-def extract_audio(video_path, output_audio_path):
-    """Extract audio from video using ffmpeg"""
+def extract_audio(video_path):
+    """Decode the audio track into 16 kHz mono float32 samples in memory, the input Whisper works on"""
     try:
         cmd = [
             "ffmpeg",
+            "-nostdin",
+            "-loglevel", "error",
             "-i", video_path,
-            "-q:a", "0",
+            "-vn",
             "-map", "a",
-            "-y",  # Overwrite output file if it exists
-            output_audio_path
+            "-ac", "1",
+            "-ar", str(WHISPER_SAMPLE_RATE),
+            "-f", "s16le",
+            "-"  # Raw PCM to stdout
         ]
         
-        run_command(cmd)
-        logger.info(f"Extracted audio to: {output_audio_path}")
-        return output_audio_path
+        # Not run_command: stdout is binary PCM, not text
+        logger.debug(f"Running command: {' '.join(cmd)}")
+        result = subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True, check=True)
+        audio = np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+        logger.info(f"Extracted {len(audio) / WHISPER_SAMPLE_RATE:.2f} seconds of audio")
+        return audio
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Failed to extract audio: {e.stderr.decode(errors='replace')}")
+        return None
     except Exception as e:
         logger.error(f"Failed to extract audio: {e}")
         return None
 
-def extract_clip_without_subtitles(input_video, output_path, start_time, duration):
-    """Extract a clip from the video without adding subtitles"""
+@lru_cache(maxsize=None)
+def detect_hw_encoder():
+    """
+    Find a working hardware H.264 encoder, falling back to libx264
+    
+    An encoder being compiled into ffmpeg doesn't mean the hardware is there,
+    so each candidate is checked with a tiny test encode.
+    
+    Returns:
+        Tuple of (encoder name, encoder options)
+    """
     try:
-        cmd = [
-            "ffmpeg",
-            "-ss", str(start_time),
-            "-i", input_video,
-            "-t", str(duration),
-            "-c:v", "libx264",
-            "-preset", "fast",
-            "-c:a", "aac",
-            "-y",
-            output_path
-        ]
-        
-        logger.info(f"Extracting clip from {start_time}s to {start_time + duration}s")
-        run_command(cmd)
-        return output_path
+        result = run_command(["ffmpeg", "-hide_banner", "-encoders"], check=False, capture=True)
+        available = result.stdout
     except Exception as e:
-        logger.error(f"Failed to extract clip: {e}")
-        return None
-
-def convert_to_reels_format(input_video, output_path):
-    """Convert video to reels format (9:16 aspect ratio) with black padding"""
-    try:
-        cmd = [
-            "ffmpeg",
-            "-i", input_video,
-            "-vf", f"scale=w={OUTPUT_WIDTH}:h={OUTPUT_HEIGHT}:force_original_aspect_ratio=decrease,pad={OUTPUT_WIDTH}:{OUTPUT_HEIGHT}:(ow-iw)/2:(oh-ih)/2:black:",
-            "-c:v", "libx264",
-            "-preset", "fast",
-            "-c:a", "copy",
-            "-y",
-            output_path
+        logger.warning(f"Could not list ffmpeg encoders: {e}")
+        return SOFTWARE_ENCODER
+    
+    for encoder, options in HW_ENCODERS.items():
+        if f" {encoder} " not in available:
+            continue
+        test_cmd = [
+            "ffmpeg", "-hide_banner",
+            "-f", "lavfi", "-i", "color=black:size=256x256:duration=0.1",
+            "-c:v", encoder, *options,
+            "-f", "null", "-"
         ]
-        
-        logger.info(f"Converting to reels format ({OUTPUT_WIDTH}x{OUTPUT_HEIGHT})")
-        run_command(cmd)
-        return output_path
-    except Exception as e:
-        logger.error(f"Failed to convert to reels format: {e}")
-        return None
+        try:
+            if run_command(test_cmd, check=False).returncode == 0:
+                logger.info(f"Using hardware encoder: {encoder}")
+                return encoder, options
+        except Exception:
+            pass
+        logger.debug(f"Hardware encoder {encoder} is listed but not usable")
+    
+    logger.info(f"No hardware encoder available, using {SOFTWARE_ENCODER[0]}")
+    return SOFTWARE_ENCODER
+
+def escape_filter_value(value):
+    """Escape a filter option value (e.g. a file path) for use inside a -filter_complex graph"""
+    # First for the filter's option parser, then for the filtergraph parser
+    for special in "\\':":
+        value = value.replace(special, "\\" + special)
+    for special in "\\'[],;":
+        value = value.replace(special, "\\" + special)
+    return value
 
-def add_subtitles_to_video(input_video, subtitle_file, output_path):
-    """Add subtitles to video using the subtitles filter"""
+def build_clip_command(start_time, duration, output_path, srt_path=None, music_file=None,
+                       volume_points=None, encoder=None):
+    """
+    Build a single ffmpeg command that cuts a clip, converts it to reels format,
+    burns in subtitles and mixes in background music in one encode
+    
+    encoder is an (encoder name, encoder options) tuple; by default the one
+    found by detect_hw_encoder() is used.
+    """
+    encoder, encoder_options = encoder or detect_hw_encoder()
+    cmd = ["ffmpeg", "-hide_banner", "-nostats", "-ss", str(start_time), "-i", INPUT_VIDEO]
+    
+    # Video branch: scale and pad to reels format (9:16) with black padding, then burn subtitles
+    video_filter = (
+        f"[0:v]scale=w={OUTPUT_WIDTH}:h={OUTPUT_HEIGHT}:force_original_aspect_ratio=decrease,"
+        f"pad={OUTPUT_WIDTH}:{OUTPUT_HEIGHT}:(ow-iw)/2:(oh-ih)/2:black"
+    )
+    if srt_path:
+        video_filter += f",subtitles=filename={escape_filter_value(srt_path)}:charenc=UTF-8"
+    filters = [f"{video_filter}[v]"]
+    audio_map = "0:a?"
+    
+    # Audio branch: mix in the music, looped at the demuxer to cover the clip and ducked during speech
+    if music_file:
+        cmd += ["-stream_loop", "-1", "-i", music_file]
+        music_filters = [f"volume={MUSIC_VOLUME}", *(volume_points or [])]
+        filters.append(f"[1:a]{','.join(music_filters)}[music]")
+        filters.append("[0:a][music]amix=inputs=2:duration=first:normalize=0[a]")
+        audio_map = "[a]"
+    
+    cmd += [
+        "-filter_complex", ";".join(filters),
+        "-map", "[v]",
+        "-map", audio_map,
+        "-t", str(duration),
+        "-threads", str(FFMPEG_THREADS),
+        "-c:v", encoder,
+        *encoder_options,
+        "-c:a", "aac",
+        "-f", "mp4",  # The output name may not end in .mp4 (see process_single_clip)
+        "-y",
+        output_path
+    ]
+    return cmd
+
+def process_single_clip(clip_num, start_time, end_time, clip_segments, music_track, encoder):
+    """
+    Turn one section of the input video into a finished reel
+    
+    Runs in a worker process when clips are processed in parallel, so it only
+    takes picklable arguments. encoder is the (name, options) tuple from
+    detect_hw_encoder(), detected once in the parent process.
+    
+    Returns:
+        Path of the created reel, or None if the clip failed
+    """
+    clip_duration = end_time - start_time
+    
+    logger.info(f"\nProcessing clip {clip_num} ({start_time}-{end_time} seconds)...")
+    
+    temp_srt_path = f"temp_subtitles_{clip_num}.srt"
+    final_output_path = os.path.join(OUTPUT_FOLDER, f"reel_{clip_num:02d}.mp4")
+    
+    safe_remove(temp_srt_path)
+    
     try:
-        # Convert Windows path to safe format for FFmpeg
-        subtitle_safe_path = subtitle_file.replace('\\', '/').replace(':', '\\:')
-        
-        # Prepare subtitle filter
-        subtitle_filter = f"subtitles=filename={shlex.quote(subtitle_file)}"
+        # Generate subtitles and volume ducking points if available
+        srt_path = None
+        volume_points = None
         
-        logger.info(f"Adding subtitles to video from {subtitle_file}")
-        
-        # Use shell=True for Windows to handle the subtitle path correctly
-        if os.name == 'nt':
-            subprocess_cmd = f'ffmpeg -i "{input_video}" -vf "subtitles={subtitle_file}" -c:v libx264 -preset fast -c:a copy -y "{output_path}"'
-            run_command(subprocess_cmd, shell=True)
-        else:
-            cmd = [
-                "ffmpeg",
-                "-i", input_video,
-                "-vf", subtitle_filter,
-                "-c:v", "libx264",
-                "-preset", "fast",
-                "-c:a", "copy",
-                "-y",
-                output_path
+        if clip_segments:
+            # Adjust segment times to be relative to the clip
+            clip_segments_adjusted = [
+                Segment(
+                    start=max(0, segment.start - start_time),
+                    end=min(clip_duration, segment.end - start_time),
+                    text=segment.text
+                )
+                for segment in clip_segments
             ]
-            run_command(cmd)
+            
+            # Generate volume ducking points for background music
+            volume_points = generate_volume_automation(clip_segments_adjusted, max_points=5)
+            
+            # Generate SRT with time offset
+            srt_path = generate_srt_file(clip_segments, temp_srt_path, time_offset=start_time)
+            if not srt_path:
+                logger.warning(f"Failed to generate SRT for clip {clip_num}. Using non-subtitled version.")
+        else:
+            logger.info(f"No speech segments in clip {clip_num}. No subtitles needed.")
         
-        return output_path
-    except Exception as e:
-        logger.error(f"Failed to add subtitles: {e}")
-        return None
-
-def add_background_music(input_video, music_file, output_path, volume_points=None, clip_duration=None):
-    """Add background music to video with simplified volume control during speech"""
-    try:
-        if not music_file or not os.path.exists(music_file):
-            logger.warning("No music file available, skipping music addition")
-            if os.path.exists(input_video):
-                # Just copy the input file to output
-                safe_rename(input_video, output_path)
-            return output_path
+        if music_track:
+            logger.info(f"Adding background music to clip {clip_num}...")
         
-        # Use a simpler approach with fewer filter points
-        # Instead of many small segments, use a constant volume reduction
+        # Cut, reformat, subtitle and mix the clip in a single encode. The encode
+        # goes to a temp file next to the reel so that a failed or interrupted
+        # run never leaves a truncated reel behind, and the move is a rename.
+        logger.info(f"Encoding clip {clip_num} from {start_time}s to {end_time}s "
+                    f"({OUTPUT_WIDTH}x{OUTPUT_HEIGHT}{', subtitled' if srt_path else ''})")
+        # If the encode fails, fall back to libx264 (a hardware encoder can run
+        # out of sessions under parallel jobs), then drop the subtitles and/or
+        # the music (an undecodable track, or a source without audio), so a
+        # reel is still saved whenever the video itself can be encoded
+        attempts = [(srt_path, music_track, encoder)]
+        for fallback in [(srt_path, music_track, SOFTWARE_ENCODER),
+                         (None, music_track, SOFTWARE_ENCODER),
+                         (srt_path, None, SOFTWARE_ENCODER),
+                         (None, None, SOFTWARE_ENCODER)]:
+            if fallback not in attempts:
+                attempts.append(fallback)
         
-        # Get clip duration if not provided
-        if not clip_duration:
+        # The .part suffix keeps a partial encode left by a killed run from
+        # looking like a reel (and being picked up by the uploader)
+        with temp_file(suffix='.mp4.part', dir=OUTPUT_FOLDER) as temp_output_path:
             try:
-                result = run_command([
-                    "ffprobe", "-v", "error", "-show_entries", "format=duration", 
-                    "-of", "json", input_video
-                ])
-                clip_duration = float(json.loads(result.stdout)["format"]["duration"])
-            except Exception as e:
-                logger.error(f"Error getting clip duration: {e}")
-                clip_duration = 120  # Default to 2 minutes
-        
-        # Get music duration
-        try:
-            result = run_command([
-                "ffprobe", "-v", "error", "-show_entries", "format=duration", 
-                "-of", "json", music_file
-            ])
-            music_duration = float(json.loads(result.stdout)["format"]["duration"])
-            logger.info(f"Music duration: {music_duration:.2f}s, Clip duration: {clip_duration:.2f}s")
-        except Exception as e:
-            logger.error(f"Error getting music duration: {e}")
-            music_duration = 0
-        
-        # Determine if we need to loop the music
-        music_filter = ""
-        if music_duration > 0 and clip_duration > 0 and music_duration < clip_duration:
-            # Need to loop the music
-            loop_count = math.ceil(clip_duration / music_duration)
-            music_filter = f"aloop=loop={loop_count-1}:size=0,"
-            logger.info(f"Looping music {loop_count} times to match clip duration")
-        
-        # Create a temporary file for the music with adjusted volume
-        with temp_file(suffix='.mp3') as temp_music_path:
-            # First, create a version of the music with constant volume
-            music_vol_cmd = [
-                "ffmpeg",
-                "-i", music_file,
-                "-af", f"{music_filter}volume={MUSIC_VOLUME}",
-                "-y",
-                temp_music_path
-            ]
-            run_command(music_vol_cmd)
-            
-            # Now mix the adjusted music with the original video
-            cmd = [
-                "ffmpeg",
-                "-i", input_video,
-                "-i", temp_music_path,
-                "-filter_complex", "[0:a][1:a]amix=duration=longest:normalize=0",
-                "-c:v", "copy",  # Copy video stream
-                "-shortest",     # End when shortest input ends
-                "-y",
-                output_path
-            ]
+                for attempt, (subtitles, music, clip_encoder) in enumerate(attempts):
+                    try:
+                        run_command(build_clip_command(
+                            start_time, clip_duration, temp_output_path,
+                            subtitles, music, volume_points, clip_encoder
+                        ))
+                        break
+                    except subprocess.CalledProcessError:
+                        if attempt + 1 == len(attempts):
+                            raise
+                        next_subtitles, next_music, next_encoder = attempts[attempt + 1]
+                        logger.warning(
+                            f"Encoding clip {clip_num} with {clip_encoder[0]} failed. Retrying with {next_encoder[0]}"
+                            f"{', without subtitles' if srt_path and not next_subtitles else ''}"
+                            f"{', without music' if music_track and not next_music else ''}."
+                        )
+            finally:
+                safe_remove(temp_srt_path)
             
-            logger.info(f"Adding background music with constant volume")
-            run_command(cmd)
+            # mkstemp creates the file owner-only; give the reel the usual permissions
+            try:
+                os.chmod(temp_output_path, 0o666 & ~FILE_UMASK)
+            except OSError as e:
+                logger.warning(f"Failed to set permissions on {temp_output_path}: {e}")
+            renamed = safe_rename(temp_output_path, final_output_path)
+        
+        # Verify final output exists
+        if renamed and os.path.exists(final_output_path):
+            logger.info(f"Successfully created: {final_output_path}")
+            return final_output_path
+        logger.error(f"Failed to create final output for clip {clip_num}")
+        return None
         
-        return output_path
     except Exception as e:
-        logger.error(f"Failed to add background music: {e}")
-        # Try to salvage by using the input video if it exists
-        if os.path.exists(input_video) and not os.path.exists(output_path):
-            logger.info(f"Salvaging by copying input video to output")
-            safe_rename(input_video, output_path)
-        return output_path
-
-def process_video():
+        logger.error(f"Error processing clip {clip_num}: {e}")
+        safe_remove(temp_srt_path)
+        return None
+
+def _init_clip_worker():
+    """Lower the priority of clip worker processes (inherited by their ffmpeg children)"""
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+def process_video(jobs=DEFAULT_JOBS):
     """Main function to process video into captioned reels clips with background music"""
     try:
         if not os.path.exists(INPUT_VIDEO):
@@ -520,12 +667,14 @@ def process_video():
         
         # Extract full audio for transcription
         logger.info("Extracting audio from video for transcription...")
-        with temp_file(suffix='.mp3') as temp_audio_path:
-            extract_audio(INPUT_VIDEO, temp_audio_path)
-            
-            # Transcribe full audio
+        audio = extract_audio(INPUT_VIDEO)
+        
+        # Transcribe full audio
+        all_segments, full_transcript = [], ""
+        if audio is not None:
             logger.info("Transcribing audio...")
-            all_segments, full_transcript = transcribe_audio(temp_audio_path)
+            all_segments, full_transcript = transcribe_audio(audio)
+            del audio
         
         # Analyze content to select appropriate music
         music_track = None
@@ -546,144 +695,41 @@ def process_video():
         if not all_segments:
             logger.warning("No transcription available. Processing will continue without captions.")
         
-        # Process video in clips
-        clip_num = 1
-        processed_clips = []
+        # Probe the encoder once here and pass it to the workers; with spawn
+        # (Windows, macOS) they start with an empty cache
+        encoder = detect_hw_encoder()
         
-        for start_time in range(0, int(video_duration), CLIP_DURATION):
-            end_time = min(start_time + CLIP_DURATION, int(video_duration))
-            clip_duration = end_time - start_time
-            
-            logger.info(f"\nProcessing clip {clip_num} ({start_time}-{end_time} seconds)...")
-            
-            # Create temporary filenames
-            temp_clip_path = f"temp_clip_{clip_num}.mp4"
-            temp_reels_path = f"temp_reels_{clip_num}.mp4"
-            temp_subtitled_path = f"temp_subtitled_{clip_num}.mp4"
-            temp_srt_path = f"temp_subtitles_{clip_num}.srt"
-            final_output_path = os.path.join(OUTPUT_FOLDER, f"reel_{clip_num:02d}.mp4")
-            
-            # Make sure any existing temporary files are removed
-            for temp_filepath in [temp_clip_path, temp_reels_path, temp_subtitled_path, temp_srt_path]:
-                safe_remove(temp_filepath)
-            
-            try:
-                # Step 1: Extract clip without modifications
-                extracted_clip = extract_clip_without_subtitles(INPUT_VIDEO, temp_clip_path, start_time, clip_duration)
-                if not extracted_clip or not os.path.exists(temp_clip_path):
-                    logger.error(f"Failed to extract clip {clip_num}. Skipping.")
-                    continue
-                
-                # Step 2: Convert to reels format with padding
-                converted_clip = convert_to_reels_format(temp_clip_path, temp_reels_path)
-                if not converted_clip or not os.path.exists(temp_reels_path):
-                    logger.error(f"Failed to convert clip {clip_num} to reels format. Skipping.")
-                    safe_remove(temp_clip_path)
-                    continue
-                
-                # Clean up intermediate file
-                safe_remove(temp_clip_path)
-                
-                # Step 3: Add subtitles if available
-                volume_points = None
-                using_reels_as_subtitled = False
-                
-                if all_segments:
-                    # Filter segments for this clip
-                    clip_segments = [
-                        segment for segment in all_segments
-                        if segment.end > start_time and segment.start < end_time
-                    ]
-                    
-                    # Adjust segment times to be relative to the clip
-                    clip_segments_adjusted = []
-                    for segment in clip_segments:
-                        adjusted = Segment(
-                            start=max(0, segment.start - start_time),
-                            end=min(clip_duration, segment.end - start_time),
-                            text=segment.text
-                        )
-                        clip_segments_adjusted.append(adjusted)
-                    
-                    # Generate volume ducking points for background music
-                    # volume_points = generate_volume_automation(clip_segments_adjusted, clip_duration)
-                    volume_points = generate_volume_automation(clip_segments_adjusted, clip_duration, max_points=5)
-
-                    
-                    if clip_segments:
-                        # Generate SRT with time offset
-                        srt_generated = generate_srt_file(clip_segments, temp_srt_path, time_offset=start_time)
-                        
-                        if srt_generated and os.path.exists(temp_srt_path):
-                            # Add subtitles
-                            logger.info(f"Adding subtitles to clip {clip_num}...")
-                            subtitled_clip = add_subtitles_to_video(temp_reels_path, temp_srt_path, temp_subtitled_path)
-                            
-                            if subtitled_clip and os.path.exists(temp_subtitled_path):
-                                # Successfully added subtitles
-                                safe_remove(temp_reels_path)
-                            else:
-                                # Failed to add subtitles, use non-subtitled version
-                                logger.warning(f"Failed to add subtitles to clip {clip_num}. Using non-subtitled version.")
-                                temp_subtitled_path = temp_reels_path
-                                using_reels_as_subtitled = True
-                            
-                            # Clean up temporary SRT file
-                            safe_remove(temp_srt_path)
-                        else:
-                            # SRT generation failed
-                            logger.warning(f"Failed to generate SRT for clip {clip_num}. Using non-subtitled version.")
-                            temp_subtitled_path = temp_reels_path
-                            using_reels_as_subtitled = True
-                    else:
-                        # No segments in this clip
-                        logger.info(f"No speech segments in clip {clip_num}. No subtitles needed.")
-                        temp_subtitled_path = temp_reels_path
-                        using_reels_as_subtitled = True
-                else:
-                    # No transcription available
-                    temp_subtitled_path = temp_reels_path
-                    using_reels_as_subtitled = True
-                
-                # Step 4: Add background music if available
-                # Make sure final_output_path doesn't exist before attempting to write to it
-                if os.path.exists(final_output_path):
-                    safe_remove(final_output_path)
-                
-                if music_track:
-                    logger.info(f"Adding background music to clip {clip_num}...")
-                    final_clip = add_background_music(
-                        temp_subtitled_path, 
-                        music_track, 
-                        final_output_path, 
-                        volume_points, 
-                        clip_duration
-                    )
-                else:
-                    # No music to add, just rename
-                    final_clip = temp_subtitled_path
-                    safe_rename(temp_subtitled_path, final_output_path)
-                
-                # Verify final output exists
-                if os.path.exists(final_output_path):
-                    logger.info(f"Successfully created: {final_output_path}")
-                    processed_clips.append(final_output_path)
-                else:
-                    logger.error(f"Failed to create final output for clip {clip_num}")
-                
-                # Clean up remaining temp files
-                if not using_reels_as_subtitled:
-                    safe_remove(temp_subtitled_path)
-                if os.path.exists(temp_reels_path) and not using_reels_as_subtitled:
-                    safe_remove(temp_reels_path)
-                
-            except Exception as e:
-                logger.error(f"Error processing clip {clip_num}: {e}")
-                # Clean up any temp files
-                for temp_filepath in [temp_clip_path, temp_reels_path, temp_subtitled_path, temp_srt_path]:
-                    safe_remove(temp_filepath)
-            
-            clip_num += 1
+        # Process video in clips, several at a time in worker processes
+        clip_starts = list(range(0, int(video_duration), CLIP_DURATION))
+        clip_ends = [min(start_time + CLIP_DURATION, int(video_duration)) for start_time in clip_starts]
+        clip_nums = list(range(1, len(clip_starts) + 1))
+        
+        # Whisper returns segments in time order, so each clip's segments are
+        # a contiguous slice that can be found by bisection
+        segment_starts = [segment.start for segment in all_segments]
+        segment_ends = [segment.end for segment in all_segments]
+        clip_segments = [
+            all_segments[bisect_right(segment_ends, start_time):bisect_left(segment_starts, end_time)]
+            for start_time, end_time in zip(clip_starts, clip_ends)
+        ]
+        
+        task_args = (
+            clip_nums,
+            clip_starts,
+            clip_ends,
+            clip_segments,
+            [music_track] * len(clip_starts),
+            [encoder] * len(clip_starts)
+        )
+        
+        if jobs > 1:
+            logger.info(f"Processing {len(clip_starts)} clips with {jobs} parallel jobs")
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_clip_worker) as executor:
+                results = list(executor.map(process_single_clip, *task_args))
+        else:
+            results = [process_single_clip(*args) for args in zip(*task_args)]
+        
+        processed_clips = [clip for clip in results if clip]
         
         if processed_clips:
             logger.info(f"\nSuccessfully processed {len(processed_clips)} clips:")
@@ -702,7 +748,7 @@ def check_dependencies():
     """Check for required dependencies"""
     try:
         # Check if ffmpeg is available
-        result = run_command(["ffmpeg", "-version"], check=False)
+        result = run_command(["ffmpeg", "-version"], check=False, capture=True)
         if result.returncode != 0:
             logger.error("FFmpeg not installed or not in PATH. Please install ffmpeg first.")
             return False
@@ -710,24 +756,31 @@ def check_dependencies():
             logger.info(f"FFmpeg found: {result.stdout.splitlines()[0] if result.stdout else 'version unknown'}")
         
         # Check for whisper
-        try:
-            import whisper
-            logger.info("Whisper library found")
+        if importlib.util.find_spec("faster_whisper") is not None:
+            logger.info("faster-whisper library found")
             return True
-        except ImportError:
+        elif importlib.util.find_spec("whisper") is not None:
+            logger.info("Whisper library found (install faster-whisper for faster transcription)")
+            return True
+        else:
             logger.error("Whisper not installed. Please install it with:")
-            logger.error("pip install git+https://github.com/openai/whisper.git")
+            logger.error("pip install faster-whisper")
             return False
     except Exception as e:
         logger.error(f"Error checking dependencies: {e}")
         return False
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cut a video into captioned reels clips")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                        help=f"Number of clips to process in parallel (default: {DEFAULT_JOBS})")
+    args = parser.parse_args()
+    
     logger.info("Starting video clipper script")
     
     if check_dependencies():
         logger.info("All dependencies found, starting video processing")
-        success = process_video()
+        success = process_video(jobs=max(1, args.jobs))
         if success:
             logger.info("Video processing completed successfully")
         else: